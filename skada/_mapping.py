@@ -726,6 +726,66 @@ def CORAL(
     )
 
 
+def _kernel_smoother(L, reg_k):
+    r"""Kernel smoothing matrix of MMDLSConS.
+
+    The smoothing matrix is defined by:
+
+    .. math::
+        \mathbf{\Omega} = \mathbf{L} (\mathbf{L} + \lambda \mathbf{I})^{-1}
+
+    As :math:`\mathbf{L}` and :math:`\mathbf{L} + \lambda \mathbf{I}` commute, it
+    is obtained with a Cholesky solve instead of an explicit inverse.
+
+    Parameters
+    ----------
+    L : torch.Tensor, shape (n, n)
+        Symmetric positive semi-definite kernel matrix.
+    reg_k : float
+        Regularization parameter :math:`\lambda`.
+
+    Returns
+    -------
+    omega : torch.Tensor, shape (n, n)
+        Smoothing matrix.
+    """
+    import torch
+
+    L_reg = L + reg_k * torch.eye(L.shape[0], dtype=L.dtype)
+    chol, info = torch.linalg.cholesky_ex(L_reg)
+    if info == 0:
+        return torch.cholesky_solve(L, chol)
+    # numerically singular kernel, fall back to a LU solve
+    return torch.linalg.solve(L_reg, L)
+
+
+def _mmd_consistency(K, K_cross, omega_sum):
+    r"""MMD term of MMDLSConS, up to the constant target-target term.
+
+    The sums over :math:`\mathbf{\Omega} \mathbf{K} \mathbf{\Omega}^\top` and
+    :math:`\mathbf{K}_{ts} \mathbf{\Omega}^\top` reduce to products with the
+    column sums of :math:`\mathbf{\Omega}`.
+
+    Parameters
+    ----------
+    K : torch.Tensor, shape (m, m)
+        Kernel matrix of the mapped source samples.
+    K_cross : torch.Tensor, shape (n, m)
+        Kernel matrix between the target and the mapped source samples.
+    omega_sum : torch.Tensor, shape (m,)
+        Column sums of the smoothing matrix.
+
+    Returns
+    -------
+    J_cons : torch.Tensor
+        Value of the MMD term.
+    """
+    m, n = K.shape[0], K_cross.shape[0]
+    J_cons = (1 / (m**2)) * (omega_sum @ K @ omega_sum)
+    J_cons -= (2 / (m * n)) * (K_cross.sum(dim=0) @ omega_sum)
+    return J_cons
+
+
 # xxx(okachaiev): we should move this to 'skada.deep.*' I guess
 # to avoid defining things that won't work anyways
 class MMDLSConSMappingAdapter(BaseAdapter):
@@ -805,23 +865,26 @@ class MMDLSConSMappingAdapter(BaseAdapter):
 
         # compute omega
         L = torch.exp(-self.gamma * torch.cdist(X_source, X_source, p=2))
-        omega = L @ torch.linalg.inv(L + self.reg_k * torch.eye(m))
+        omega = _kernel_smoother(L, self.reg_k)
 
         # compute R
         if discrete:
-            self.classes_ = classes = torch.unique(y_source).numpy()
-            R = torch.zeros((m, len(classes)), dtype=torch.float64)
-            for i, c in enumerate(classes):
-                R[:, i] = (y_source == c).int()
+            classes, y_idx = torch.unique(y_source, return_inverse=True)
+            self.classes_ = classes = classes.numpy()
+            # one-hot encoding of the labels
+            R = torch.eye(len(classes), dtype=torch.float64)[y_idx]
         else:
             self.classes_ = None
-            R = L @ torch.linalg.inv(L + self.reg_k * torch.eye(m))
+            R = omega
 
         # solve the optimization problem
         # min_{G, H} MMD(W \odot X^s + B, X^t)
         # s.t. W = RG, B = RH
         k = R.shape[1]
 
+        # omega does not depend on (G, H)
+        omega_sum = omega.sum(dim=0)
+
         def func(G, H):
             W = R @ G
             B = R @ H
@@ -830,8 +893,7 @@ class MMDLSConSMappingAdapter(BaseAdapter):
 
             K = torch.exp(-self.gamma * torch.cdist(X_new, X_new, p=2))
             K_cross = torch.exp(-self.gamma * torch.cdist(X_target, X_new, p=2))
-            J_cons = (1 / (m**2)) * torch.sum(omega @ K @ omega.T)
-            J_cons -= (2 / (m * n)) * torch.sum(K_cross @ omega.T)
+            J_cons = _mmd_consistency(K, K_cross, omega_sum)
 
             J_reg = (1 / m) * (torch.sum((W - 1) ** 2) + torch.sum(B**2))
 
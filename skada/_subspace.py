@@ -11,11 +11,13 @@ import warnings
 
 import numpy as np
 import scipy.linalg
+from joblib import Parallel, delayed
 from sklearn.decomposition import PCA
-from sklearn.metrics.pairwise import pairwise_kernels
+from sklearn.metrics.pairwise import pairwise_kernels, rbf_kernel
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.svm import SVC
 from sklearn.utils import check_random_state
+from sklearn.utils.extmath import safe_sparse_dot
 
 from ._pipeline import make_da_pipeline
 from .base import BaseAdapter
@@ -43,6 +45,12 @@ class SubspaceAlignmentAdapter(BaseAdapter):
     random_state : int, RandomState instance or None, default=None
         Determines random number generation for dataset creation. Pass an int
         for reproducible output across multiple function calls.
+    n_jobs : int, default=None
+        The number of threads used to fit the source and target PCAs
+        concurrently.
+        ``None`` means 1 unless in a :obj:`joblib.parallel_backend` context.
+        ``-1`` means using all processors. See :term:`Glossary <n_jobs>`
+        for more details.
 
     Attributes
     ----------
@@ -50,6 +58,12 @@ class SubspaceAlignmentAdapter(BaseAdapter):
         The PCA object fitted on the source data.
     `pca_target_` : object
         The PCA object fitted on the target data.
+    `M_` : array of shape (n_components, n_components)
+        The alignment matrix between the source and target subspaces.
+    `proj_source_` : array of shape (n_features, n_components)
+        Projection of the centered source data onto the aligned subspace.
+    `proj_target_` : array of shape (n_features, n_components)
+        Projection of the centered target data onto the target subspace.
 
     References
     ----------
@@ -62,10 +76,12 @@ class SubspaceAlignmentAdapter(BaseAdapter):
         self,
         n_components=None,
         random_state=None,
+        n_jobs=None,
     ):
         super().__init__()
         self.n_components = n_components
         self.random_state = random_state
+        self.n_jobs = n_jobs
 
     def fit(self, X, y=None, sample_domain=None, **kwargs):
         """Fit adaptation parameters.
@@ -97,14 +113,21 @@ class SubspaceAlignmentAdapter(BaseAdapter):
         else:
             n_components = self.n_components
         self.random_state_ = check_random_state(self.random_state)
-        self.pca_source_ = PCA(n_components, random_state=self.random_state_).fit(
-            X_source
-        )
-        self.pca_target_ = PCA(n_components, random_state=self.random_state_).fit(
-            X_target
+        # the two fits are independent and spend their time in LAPACK, which
+        # releases the GIL, so they can run in threads. Each one gets its own
+        # seed to stay reproducible whatever the order of execution.
+        seeds = self.random_state_.randint(np.iinfo(np.int32).max, size=2)
+        self.pca_source_, self.pca_target_ = Parallel(
+            n_jobs=self.n_jobs, prefer="threads"
+        )(
+            delayed(PCA(n_components, random_state=seed).fit)(X_domain)
+            for X_domain, seed in zip((X_source, X_target), seeds)
         )
         self.n_components_ = n_components
         self.M_ = np.dot(self.pca_source_.components_, self.pca_target_.components_.T)
+        # projections applied to the centered data in transform
+        self.proj_source_ = np.dot(self.pca_source_.components_.T, self.M_)
+        self.proj_target_ = self.pca_target_.components_.T
         return self
 
     def transform(
@@ -136,9 +159,9 @@ class SubspaceAlignmentAdapter(BaseAdapter):
         X_source, X_target = source_target_split(X, sample_domain=sample_domain)
 
         if X_source.shape[0]:
-            X_source = np.dot(self.pca_source_.transform(X_source), self.M_)
+            X_source = np.dot(X_source - self.pca_source_.mean_, self.proj_source_)
         if X_target.shape[0]:
-            X_target = self.pca_target_.transform(X_target)
+            X_target = np.dot(X_target - self.pca_target_.mean_, self.proj_target_)
         X_adapt, _ = source_target_merge(
             X_source, X_target, sample_domain=sample_domain
         )
@@ -170,6 +193,7 @@ def SubspaceAlignment(
     base_estimator=None,
     n_components=None,
     random_state=None,
+    n_jobs=None,
 ):
     """Domain Adaptation Using Subspace Alignment.
 
@@ -187,6 +211,12 @@ def SubspaceAlignment(
     random_state : int, RandomState instance or None, default=None
         Determines random number generation for dataset creation. Pass an int
         for reproducible output across multiple function calls.
+    n_jobs : int, default=None
+        The number of threads used to fit the source and target PCAs
+        concurrently.
+        ``None`` means 1 unless in a :obj:`joblib.parallel_backend` context.
+        ``-1`` means using all processors. See :term:`Glossary <n_jobs>`
+        for more details.
 
     Returns
     -------
@@ -206,11 +236,85 @@ def SubspaceAlignment(
         SubspaceAlignmentAdapter(
             n_components=n_components,
             random_state=random_state,
+            n_jobs=n_jobs,
         ),
         base_estimator,
     )
 
 
+def _full_kernel(X_source, X_target, metric):
+    """Kernel matrix between the stacked source and target samples.
+
+    The Gram matrix is computed in one call on the concatenated data so that
+    it is directly laid out as ``[[Kss, Kst], [Kts, Ktt]]``.
+    """
+    X = np.concatenate((X_source, X_target), axis=0)
+    return _pairwise_kernel(X, metric=metric)
+
+
+def _pairwise_kernel(X, Y=None, metric="rbf"):
+    """Kernel matrix between X and Y.
+
+    The RBF and linear kernels call their sklearn implementation directly,
+    skipping the generic dispatch of ``pairwise_kernels`` used for the other
+    kernels.
+    """
+    if isinstance(metric, str):
+        if metric == "rbf":
+            return rbf_kernel(X, Y)
+        if metric == "linear":
+            return safe_sparse_dot(X, X.T if Y is None else Y.T, dense_output=True)
+    return pairwise_kernels(X, Y, metric=metric)
+
+
+def _is_fit_data(X, sample_domain, estimator):
+    """Check whether X is the data the estimator was fitted on.
+
+    With ``estimator.deep_check`` the source and target parts of X are
+    compared elementwise with the copies of the fitted data.
+
+    Otherwise the check is O(1): X matches when it is the same object as the
+    array given to fit or a view with the same memory layout, and the domain
+    labels are compared elementwise, which is cheap compared to the data. The
+    array given to fit is kept alive by the estimator, so its buffer address
+    cannot be reused by another array, but in-place modifications of it are
+    not detected.
+    """
+    if estimator.deep_check:
+        X_source, X_target = source_target_split(
+            X.astype(estimator.X_source_.dtype, copy=False),
+            sample_domain=sample_domain,
+        )
+        return np.array_equal(X_source, estimator.X_source_) and np.array_equal(
+            X_target, estimator.X_target_
+        )
+
+    X_fit = estimator._X_fit
+    sample_domain_fit = estimator._sample_domain_fit
+    if X is not X_fit and (
+        X.shape != X_fit.shape
+        or X.dtype != X_fit.dtype
+        or X.strides != X_fit.strides
+        or X.ctypes.data != X_fit.ctypes.data
+    ):
+        return False
+    return sample_domain is sample_domain_fit or np.array_equal(
+        sample_domain, sample_domain_fit
+    )
+
+
+def _mmd_vector(ns, nt, dtype=np.float64):
+    """Vector e such that the MMD matrix is the rank-one product e e^T.
+
+    The entries are ``1 / ns`` on the source samples and ``-1 / nt`` on the
+    target samples.
+    """
+    e = np.empty(ns + nt, dtype=dtype)
+    e[:ns] = 1.0 / ns
+    e[ns:] = -1.0 / nt
+    return e
+
+
 class TransferComponentAnalysisAdapter(BaseAdapter):
     """Transfer Component Analysis.
 
@@ -227,6 +331,16 @@ class TransferComponentAnalysisAdapter(BaseAdapter):
     mu : float, default=0.1
         The parameter of the regularization in the optimization
         problem.
+    dtype : numpy dtype, default=np.float64
+        The floating point type used for the kernel and the eigendecomposition.
+        np.float32 halves the memory of the n x n matrices at the cost of
+        precision.
+    deep_check : bool, default=False
+        How transform recognizes the data seen in fit, to reuse the kernel
+        computed there. If False, the data is recognized when it is the array
+        given to fit (or a view with the same memory layout), which is O(1):
+        modifying that array in place after fit is then not detected. If True,
+        the data is compared elementwise with the fitted data.
 
     Attributes
     ----------
@@ -248,11 +362,20 @@ class TransferComponentAnalysisAdapter(BaseAdapter):
            on Neural Networks, 2011.
     """
 
-    def __init__(self, kernel="rbf", n_components=None, mu=0.1):
+    def __init__(
+        self,
+        kernel="rbf",
+        n_components=None,
+        mu=0.1,
+        dtype=np.float64,
+        deep_check=False,
+    ):
         super().__init__()
         self.kernel = kernel
         self.n_components = n_components
         self.mu = mu
+        self.dtype = dtype
+        self.deep_check = deep_check
 
     def fit(self, X, y=None, *, sample_domain=None):
         """Fit adaptation parameters.
@@ -277,37 +400,49 @@ class TransferComponentAnalysisAdapter(BaseAdapter):
             allow_multi_source=True,
             allow_multi_target=True,
         )
-        self.X_source_, self.X_target_ = source_target_split(
-            X, sample_domain=sample_domain
-        )
+        X_source, X_target = source_target_split(X, sample_domain=sample_domain)
+        self.X_source_ = X_source.astype(self.dtype, copy=False)
+        self.X_target_ = X_target.astype(self.dtype, copy=False)
+        # kept to recognize the fitted data in transform without comparing it
+        self._X_fit = X
+        self._sample_domain_fit = sample_domain
 
-        Kss = pairwise_kernels(self.X_source_, metric=self.kernel)
-        Ktt = pairwise_kernels(self.X_target_, metric=self.kernel)
-        Kst = pairwise_kernels(self.X_source_, self.X_target_, metric=self.kernel)
-        K = np.block([[Kss, Kst], [Kst.T, Ktt]])
+        K = _full_kernel(self.X_source_, self.X_target_, self.kernel)
         self.K_ = K
 
         ns = self.X_source_.shape[0]
         nt = self.X_target_.shape[0]
-        Lss = 1 / ns**2 * np.ones((ns, ns))
-        Ltt = 1 / nt**2 * np.ones((nt, nt))
-        Lst = -1 / (ns * nt) * np.ones((ns, nt))
-        L = np.block([[Lss, Lst], [Lst.T, Ltt]])
-
-        H = np.eye(ns + nt) - 1 / (ns + nt) * np.ones((ns + nt, ns + nt))
-
-        A = np.eye(ns + nt) + self.mu * K @ L @ K
-        B = K @ H @ K
-        solution = np.linalg.solve(A, B)
-
-        eigvals, eigvects = np.linalg.eigh(solution)
-
+        # the MMD matrix is L = e e^T, hence K L K = (K e) (K e)^T
+        Ke = K @ _mmd_vector(ns, nt, dtype=K.dtype)
+
+        A = np.eye(ns + nt, dtype=K.dtype) + self.mu * np.outer(Ke, Ke)
+        # K H K with the centering matrix H = I - 1/n 11^T: since H is
+        # idempotent, K H K = (K H) (K H)^T and K H removes the row means of K
+        K_centered = K - K.mean(axis=1, keepdims=True)
+        B = K_centered @ K_centered.T
+        # both matrices of the pencil are symmetric (A is positive definite),
+        # so the generalized symmetric solver gives the eigenvectors of
+        # A^{-1} B without forming the (non-symmetric) product explicitly
+        A = 0.5 * (A + A.T)
+        B = 0.5 * (B + B.T)
         if self.n_components is None:
             n_components = min(X.shape[0], X.shape[1])
         else:
             n_components = self.n_components
-        selected_components = np.argsort(np.abs(eigvals))[::-1][:n_components]
-        self.eigvects_ = np.real(eigvects[:, selected_components])
+        n = ns + nt
+        n_components = min(n_components, n)
+        # B is positive semi-definite, so the eigenvalues of largest magnitude
+        # are the largest ones: only those are computed, in decreasing order
+        _, eigvects = scipy.linalg.eigh(
+            B,
+            A,
+            subset_by_index=(n - n_components, n - 1),
+            driver="gvx",
+            check_finite=False,
+        )
+        self.eigvects_ = eigvects[:, ::-1]
+        # embedding of the fitted data, returned as is by transform
+        self._X_embed = K @ self.eigvects_
         return self
 
     def fit_transform(self, X, y=None, *, sample_domain=None, **params):
@@ -357,22 +492,23 @@ class TransferComponentAnalysisAdapter(BaseAdapter):
             allow_multi_source=True,
             allow_multi_target=True,
         )
-        X_source, X_target = source_target_split(X, sample_domain=sample_domain)
-
-        if np.array_equal(X_source, self.X_source_) and np.array_equal(
-            X_target, self.X_target_
-        ):
-            X_ = (self.K_ @ self.eigvects_)[: X.shape[0]]
+        if _is_fit_data(X, sample_domain, self):
+            X_ = self._X_embed.copy()
         else:
-            Ks = pairwise_kernels(X, self.X_source_, metric=self.kernel)
-            Kt = pairwise_kernels(X, self.X_target_, metric=self.kernel)
-            K = np.concatenate((Ks, Kt), axis=1)
+            X = X.astype(self.dtype, copy=False)
+            X_fit = np.concatenate((self.X_source_, self.X_target_), axis=0)
+            K = _pairwise_kernel(X, X_fit, metric=self.kernel)
             X_ = (K @ self.eigvects_)[: X.shape[0]]
         return X_
 
 
 def TransferComponentAnalysis(
-    base_estimator=None, kernel="rbf", n_components=None, mu=0.1
+    base_estimator=None,
+    kernel="rbf",
+    n_components=None,
+    mu=0.1,
+    dtype=np.float64,
+    deep_check=False,
 ):
     """Domain Adaptation Using Transfer Component Analysis.
 
@@ -391,6 +527,16 @@ def TransferComponentAnalysis(
     mu : float, default=0.1
         The parameter of the regularization in the optimization
         problem.
+    dtype : numpy dtype, default=np.float64
+        The floating point type used for the kernel and the eigendecomposition.
+        np.float32 halves the memory of the n x n matrices at the cost of
+        precision.
+    deep_check : bool, default=False
+        How transform recognizes the data seen in fit, to reuse the kernel
+        computed there. If False, the data is recognized when it is the array
+        given to fit (or a view with the same memory layout), which is O(1):
+        modifying that array in place after fit is then not detected. If True,
+        the data is compared elementwise with the fitted data.
 
     Returns
     -------
@@ -408,7 +554,11 @@ def TransferComponentAnalysis(
 
     return make_da_pipeline(
         TransferComponentAnalysisAdapter(
-            kernel=kernel, n_components=n_components, mu=mu
+            kernel=kernel,
+            n_components=n_components,
+            mu=mu,
+            dtype=dtype,
+            deep_check=deep_check,
         ),
         base_estimator,
     )
@@ -439,10 +589,21 @@ class TransferJointMatchingAdapter(BaseAdapter):
         before the algorithm stops
     verbose : bool, default=False
         If True, print the loss value at each iteration.
+    deep_check : bool, default=False
+        How transform recognizes the data seen in fit, to reuse the kernel
+        computed there. If False, the data is recognized when it is the array
+        given to fit (or a view with the same memory layout), which is O(1):
+        modifying that array in place after fit is then not detected. If True,
+        the data is compared elementwise with the fitted data.
 
     Attributes
     ----------
-    None
+    `X_source_` : array
+        Source data used for the optimization problem.
+    `X_target_` : array
+        Target data used for the optimization problem.
+    `A_` : array
+        Projection matrix solution of the optimization problem.
 
     References
     ----------
@@ -461,6 +622,7 @@ class TransferJointMatchingAdapter(BaseAdapter):
         kernel="rbf",
         tol=0.01,
         verbose=False,
+        deep_check=False,
     ):
         super().__init__()
         self.n_components = n_components
@@ -469,6 +631,7 @@ class TransferJointMatchingAdapter(BaseAdapter):
         self.max_iter = max_iter
         self.tol = tol
         self.verbose = verbose
+        self.deep_check = deep_check
 
     def fit_transform(self, X, y=None, *, sample_domain=None, **params):
         """Predict adaptation (weights, sample or labels).
@@ -517,34 +680,14 @@ class TransferJointMatchingAdapter(BaseAdapter):
             allow_multi_source=True,
             allow_multi_target=True,
         )
-        X_source, X_target = source_target_split(X, sample_domain=sample_domain)
-
-        if np.array_equal(X_source, self.X_source_) and np.array_equal(
-            X_target, self.X_target_
-        ):
-            K = self._get_kernel_matrix(X_source, X_target)
-            X_ = K @ self.A_
+        if _is_fit_data(X, sample_domain, self):
+            X_ = self._X_embed.copy()
         else:
-            Ks = pairwise_kernels(X, self.X_source_, metric=self.kernel)
-            Kt = pairwise_kernels(X, self.X_target_, metric=self.kernel)
-            K = np.concatenate((Ks, Kt), axis=1)
+            X_fit = np.concatenate((self.X_source_, self.X_target_), axis=0)
+            K = _pairwise_kernel(X, X_fit, metric=self.kernel)
             X_ = K @ self.A_
         return X_
 
-    def _get_mmd_matrix(self, ns, nt, sample_domain):
-        Mss = (1 / (ns**2)) * np.ones((ns, ns))
-        Mtt = (1 / (nt**2)) * np.ones((nt, nt))
-        Mst = -(1 / (ns * nt)) * np.ones((ns, nt))
-        M = np.block([[Mss, Mst], [Mst.T, Mtt]])
-        return M
-
-    def _get_kernel_matrix(self, X_source, X_target):
-        Kss = pairwise_kernels(X_source, metric=self.kernel)
-        Ktt = pairwise_kernels(X_target, metric=self.kernel)
-        Kst = pairwise_kernels(X_source, X_target, metric=self.kernel)
-        K = np.block([[Kss, Kst], [Kst.T, Ktt]])
-        return K
-
     def fit(self, X, y=None, *, sample_domain=None):
         """Fit adaptation parameters.
 
@@ -576,28 +719,55 @@ class TransferJointMatchingAdapter(BaseAdapter):
             n_components = self.n_components
         self.X_source_ = X_source
         self.X_target_ = X_target
+        # kept to recognize the fitted data in transform without comparing it
+        self._X_fit = X
+        self._sample_domain_fit = sample_domain
 
         n = X.shape[0]
+        n_components = min(n_components, n)
         source_mask = extract_source_indices(sample_domain)
 
-        H = np.identity(n) - 1 / n * np.ones((n, n))
-        K = self._get_kernel_matrix(X_source, X_target)
-        M = self._get_mmd_matrix(X_source.shape[0], X_target.shape[0], sample_domain)
-        M /= np.linalg.norm(M, ord="fro")
-        G = np.identity(n)
+        K = _full_kernel(X_source, X_target, self.kernel)
+        # the MMD matrix is M = e e^T and its Frobenius norm is ||e||^2, so
+        # normalizing e gives K M K = (K e) (K e)^T with M of unit norm
+        e = _mmd_vector(X_source.shape[0], X_target.shape[0])
+        e /= np.linalg.norm(e)
+        Ke = K @ e
+        KMK = np.outer(Ke, Ke)
+        # K H K^T with the centering matrix H = I - 1/n 11^T expanded, it does
+        # not depend on the iterations
+        K1 = K.sum(axis=1)
+        KHK = K @ K.T - np.outer(K1, K1) / n
+        # diagonal of the reweighting matrix G, kept as a vector
+        g = np.ones(n)
+        diag = np.diag_indices(n)
 
         EPS_eigval = 1e-10
+        C = KHK + EPS_eigval * np.identity(n)
+        # C is constant across iterations: factor it once as C = L L^T and
+        # solve the whitened standard problem L^{-1} B L^{-T} v = phi v
+        L = scipy.linalg.cholesky(C, lower=True, check_finite=False)
         last_loss = -2 * self.tol
         for i in range(self.max_iter):
             # update A
-            B = K @ M @ K.T + self.tradeoff * G
-            C = K @ H @ K.T
-            B = B + EPS_eigval * np.identity(n)
-            C = C + EPS_eigval * np.identity(n)
-            phi, A = scipy.linalg.eigh(B, C)
+            B = KMK.copy()
+            B[diag] += self.tradeoff * g + EPS_eigval
+            B_tilde = scipy.linalg.solve_triangular(
+                L, B, lower=True, check_finite=False
+            )
+            B_tilde = scipy.linalg.solve_triangular(
+                L, B_tilde.T, lower=True, check_finite=False
+            )
+            B_tilde = 0.5 * (B_tilde + B_tilde.T)
+            # only the n_components smallest eigenpairs are computed
+            phi, V = scipy.linalg.eigh(
+                B_tilde,
+                subset_by_index=(0, n_components - 1),
+                driver="evr",
+                check_finite=False,
+            )
+            A = scipy.linalg.solve_triangular(L.T, V, lower=False, check_finite=False)
             phi = phi + EPS_eigval
-            indices = np.argsort(phi)[:n_components]
-            phi, A = phi[indices], A[:, indices]
             error_eigv = np.linalg.norm(B @ A - C @ A @ np.diag(phi))
             if error_eigv > 1e-5:
                 warnings.warn(
@@ -606,17 +776,16 @@ class TransferJointMatchingAdapter(BaseAdapter):
                 )
 
             # update G
-            A_norms = np.linalg.norm(A, axis=1)
-            G = np.zeros(n, dtype=np.float64)
-            G[A_norms != 0] = 1 / (2 * A_norms[A_norms != 0] + EPS_eigval)
-            G[~source_mask] = 1
-            G = np.diag(G)
-
-            loss = np.trace(A.T @ K @ M @ K @ A)
-            reg = (
-                np.sum(np.linalg.norm(A[source_mask], axis=1))
-                + np.linalg.norm(A[~source_mask]) ** 2
-            )
+            A_sq_norms = np.einsum("ij,ij->i", A, A)
+            A_norms = np.sqrt(A_sq_norms)
+            g = np.zeros(n, dtype=np.float64)
+            g[A_norms != 0] = 1 / (2 * A_norms[A_norms != 0] + EPS_eigval)
+            g[~source_mask] = 1
+
+            # trace(A^T (K e) (K e)^T A) = ||A^T K e||^2
+            AtKe = A.T @ Ke
+            loss = AtKe @ AtKe
+            reg = A_norms[source_mask].sum() + A_sq_norms[~source_mask].sum()
             loss_total = loss + self.tradeoff * reg
             # print objective function and constraint satisfaction
             if self.verbose:
@@ -624,7 +793,10 @@ class TransferJointMatchingAdapter(BaseAdapter):
                     f"iter {i}: loss={loss_total:.3e}, loss_mmd={loss:.3e}, "
                     f"reg={reg:.3e}"
                 )
-                mat = A.T @ K @ H @ K.T @ A
+                # A^T K H K^T A without the n x n product, K being symmetric
+                KA = K @ A
+                K1A = K1 @ A
+                mat = KA.T @ KA - np.outer(K1A, K1A) / n
                 cond = np.allclose(mat, np.identity(n_components))
                 dist = np.linalg.norm(mat - np.identity(n_components))
                 print(f"Constraint satisfaction: {cond}, dist={dist:.3e}")
@@ -636,6 +808,8 @@ class TransferJointMatchingAdapter(BaseAdapter):
                 last_loss = loss_total
 
         self.A_ = A
+        # embedding of the fitted data, returned as is by transform
+        self._X_embed = K @ A
 
         return self
 
@@ -647,6 +821,7 @@ def TransferJointMatching(
     kernel="rbf",
     max_iter=100,
     tol=0.01,
+    deep_check=False,
 ):
     """
 
@@ -667,7 +842,15 @@ def TransferJointMatching(
         fitting.
     kernel : kernel object, default='rbf'
         The kernel computed between data.
-    tol :
+    tol : float, default=0.01
+        The threshold for the differences between losses on two iteration
+        before the algorithm stops
+    deep_check : bool, default=False
+        How transform recognizes the data seen in fit, to reuse the kernel
+        computed there. If False, the data is recognized when it is the array
+        given to fit (or a view with the same memory layout), which is O(1):
+        modifying that array in place after fit is then not detected. If True,
+        the data is compared elementwise with the fitted data.
 
     Returns
     -------
@@ -691,6 +874,7 @@ def TransferJointMatching(
             kernel=kernel,
             max_iter=max_iter,
             tol=tol,
+            deep_check=deep_check,
         ),
         base_estimator,
     )
@@ -19,6 +19,60 @@ from .modules import DomainClassifier
 from .utils import check_generator
 
 
+def _domain_label(domain_pred, n_s, label_cache=None):
+    """Domain labels and weights of the source and target samples.
+
+    The labels are 0 on the first n_s samples and 1 on the others. The weights
+    are the inverse of the size of the domain of each sample, so that a
+    weighted sum gives the sum of the mean over each domain.
+
+    They only depend on the batch sizes, so they are stored in label_cache
+    (when given) and reused as long as the sizes, device and dtype of the
+    predictions do not change.
+    """
+    key = (n_s, domain_pred.shape, domain_pred.device, domain_pred.dtype)
+    if label_cache is not None and key in label_cache:
+        return label_cache[key]
+    n_t = domain_pred.shape[0] - n_s
+    domain_label = torch.empty_like(domain_pred)
+    domain_label[:n_s] = 0
+    domain_label[n_s:] = 1
+    domain_weight = torch.empty_like(domain_pred)
+    domain_weight[:n_s] = 1 / max(n_s, 1)
+    domain_weight[n_s:] = 1 / max(n_t, 1)
+    if label_cache is not None:
+        label_cache[key] = domain_label, domain_weight
+    return domain_label, domain_weight
+
+
+def _domain_classification_loss(
+    domain_criterion, domain_pred_s, domain_pred_t, label_cache=None
+):
+    """Sum of the domain criterion on source (label 0) and target (label 1).
+
+    When the criterion is the default mean-reduced BCE on logits, both domains are
+    evaluated in a single call on the concatenated predictions, with per-sample
+    weights turning the summed reduction into the sum of the per-domain means.
+    """
+    n_s = domain_pred_s.shape[0]
+    domain_pred = torch.cat((domain_pred_s, domain_pred_t))
+    domain_label, domain_weight = _domain_label(domain_pred, n_s, label_cache)
+
+    if (
+        type(domain_criterion) is torch.nn.BCEWithLogitsLoss
+        and domain_criterion.reduction == "mean"
+        and domain_criterion.weight is None
+        and domain_criterion.pos_weight is None
+    ):
+        return torch.nn.functional.binary_cross_entropy_with_logits(
+            domain_pred, domain_label, weight=domain_weight, reduction="sum"
+        )
+
+    return domain_criterion(domain_pred_s, domain_label[:n_s]) + domain_criterion(
+        domain_pred_t, domain_label[n_s:]
+    )
+
+
 class DANNLoss(BaseDALoss):
     """Loss DANN.
 
@@ -32,7 +86,7 @@ class DANNLoss(BaseDALoss):
     ----------
     target_criterion : torch criterion (class), default=None
         The initialized criterion (loss) used to compute the
-        DANN loss. If None, a BCELoss is used.
+        DANN loss. If None, a BCEWithLogitsLoss is used.
 
     References
     ----------
@@ -44,9 +98,10 @@ class DANNLoss(BaseDALoss):
     def __init__(self, domain_criterion=None):
         super().__init__()
         if domain_criterion is None:
-            self.domain_criterion_ = torch.nn.BCELoss()
+            self.domain_criterion_ = torch.nn.BCEWithLogitsLoss()
         else:
             self.domain_criterion_ = domain_criterion
+        self._label_cache = {}
 
     def forward(
         self,
@@ -59,19 +114,10 @@ class DANNLoss(BaseDALoss):
         features_t,
     ):
         """Compute the domain adaptation loss"""
-        domain_label = torch.zeros(
-            (domain_pred_s.size()[0]),
-            device=domain_pred_s.device,
-        )
-        domain_label_target = torch.ones(
-            (domain_pred_t.size()[0]),
-            device=domain_pred_t.device,
-        )
-
         # update classification function
-        loss = self.domain_criterion_(
-            domain_pred_s, domain_label
-        ) + self.domain_criterion_(domain_pred_t, domain_label_target)
+        loss = _domain_classification_loss(
+            self.domain_criterion_, domain_pred_s, domain_pred_t, self._label_cache
+        )
 
         return loss
 
@@ -111,7 +157,7 @@ def DANN(
         provided.
     domain_criterion : torch criterion (class)
         The criterion (loss) used to compute the
-        DANN loss. If None, a BCELoss is used.
+        DANN loss. If None, a BCEWithLogitsLoss is used.
 
     References
     ----------
@@ -158,7 +204,7 @@ class CDANLoss(BaseDALoss):
         Regularization parameter.
     target_criterion : torch criterion (class), default=None
         The initialized criterion (loss) used to compute the
-        CDAN loss. If None, a BCELoss is used.
+        CDAN loss. If None, a BCEWithLogitsLoss is used.
 
     References
     ----------
@@ -169,9 +215,10 @@ class CDANLoss(BaseDALoss):
     def __init__(self, domain_criterion=None):
         super().__init__()
         if domain_criterion is None:
-            self.domain_criterion_ = torch.nn.BCELoss()
+            self.domain_criterion_ = torch.nn.BCEWithLogitsLoss()
         else:
             self.domain_criterion_ = domain_criterion
+        self._label_cache = {}
 
     def forward(
         self,
@@ -184,20 +231,10 @@ class CDANLoss(BaseDALoss):
         features_t,
     ):
         """Compute the domain adaptation loss"""
-        dtype = torch.float32
-
-        # create domain label
-        domain_label = torch.zeros(
-            (features_s.size()[0]), device=features_s.device, dtype=dtype
-        )
-        domain_label_target = torch.ones(
-            (features_t.size()[0]), device=features_s.device, dtype=dtype
-        )
-
         # update classification function
-        loss = self.domain_criterion_(
-            domain_pred_s, domain_label
-        ) + self.domain_criterion_(domain_pred_t, domain_label_target)
+        loss = _domain_classification_loss(
+            self.domain_criterion_, domain_pred_s, domain_pred_t, self._label_cache
+        )
         return loss
 
 
@@ -353,7 +390,7 @@ def CDAN(
         If domain_classifier is None, n_classes has to be provided.
     domain_criterion : torch criterion (class)
         The criterion (loss) used to compute the
-        CDAN loss. If None, a BCELoss is used.
+        CDAN loss. If None, a BCEWithLogitsLoss is used.
 
     References
     ----------
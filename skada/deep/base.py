@@ -73,9 +73,12 @@ class DomainAwareCriterion(torch.nn.Module):
         features_t = features[~source_idx]
 
         # predict
-        return self.criterion(
-            y_pred_s, y_true[source_idx]
-        ) + self.reg * self.adapt_criterion(
+        loss = self.criterion(y_pred_s, y_true[source_idx])
+        if self.reg == 0:
+            # the adaptation loss would not contribute to the loss nor its
+            # gradient, skip its computation
+            return loss
+        loss_adapt = self.adapt_criterion(
             y_true[source_idx],
             y_pred_s,
             y_pred_t,
@@ -84,6 +87,8 @@ class DomainAwareCriterion(torch.nn.Module):
             features_s,
             features_t,
         )
+        # loss + reg * loss_adapt in a single kernel
+        return torch.add(loss, loss_adapt, alpha=self.reg)
 
 
 class BaseDALoss(torch.nn.Module):
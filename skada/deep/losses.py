@@ -42,6 +42,18 @@ def deepcoral_loss(features, features_target):
     return loss
 
 
+def _squared_distances(x, y):
+    """Squared euclidean distances between each pair of rows of x and y.
+
+    Uses ||x||^2 + ||y||^2 - 2 x y^T so that the work is a single matrix
+    product, without the square root of ``torch.cdist``.
+    """
+    x_sq = (x * x).sum(dim=1, keepdim=True)
+    y_sq = (y * y).sum(dim=1)
+    dist = torch.addmm(x_sq + y_sq, x, y.T, alpha=-2)
+    return dist.clamp_min(0)
+
+
 def deepjdot_loss(
     y_s,
     y_pred_t,
@@ -90,7 +102,7 @@ def deepjdot_loss(
             15th European Conference on Computer Vision,
             September 2018. Springer.
     """
-    dist = torch.cdist(features_s, features_t, p=2) ** 2
+    dist = _squared_distances(features_s, features_t)
 
     y_target_matrix = y_pred_t.repeat(len(y_pred_t), 1, 1).permute(1, 2, 0)
 
@@ -104,6 +104,9 @@ class GradientReversalLayer(Function):
 class DomainClassifier(nn.Module):
     """Classifier Architecture from DANN paper [15]_.
 
+    The classifier outputs logits, to be used with a loss such as
+    :class:`torch.nn.BCEWithLogitsLoss`.
+
     Parameters
     ----------
     num_features : int
@@ -126,7 +129,6 @@ class DomainClassifier(nn.Module):
             nn.BatchNorm1d(100),
             nn.ReLU(),
             nn.Linear(100, n_classes),
-            nn.Softmax(),
         )
         self.alpha = alpha
 
@@ -2,25 +2,27 @@
 #         Oleksii Kachaiev <kachayev@gmail.com>
 #
 # License: BSD 3-Clause
+from unittest import mock
+
 import pytest
 
 torch = pytest.importorskip("torch")
 
 import numpy as np
-from torch.nn import BCELoss
+from torch.nn import BCEWithLogitsLoss
 
 from skada.datasets import make_shifted_datasets
-from skada.deep import CDAN, DANN
+from skada.deep import CDAN, DANN, CDANLoss, DANNLoss
 from skada.deep.modules import DomainClassifier, ToyModule2D
 
 
 @pytest.mark.parametrize(
     "domain_classifier, domain_criterion, num_features",
     [
-        (DomainClassifier(num_features=10), BCELoss(), None),
+        (DomainClassifier(num_features=10), BCEWithLogitsLoss(), None),
         (DomainClassifier(num_features=10), None, None),
         (None, None, 10),
-        (None, BCELoss(), 10),
+        (None, BCEWithLogitsLoss(), 10),
     ],
 )
 def test_dann(domain_classifier, domain_criterion, num_features):
@@ -65,11 +67,11 @@ def test_dann(domain_classifier, domain_criterion, num_features):
 @pytest.mark.parametrize(
     "domain_classifier, domain_criterion, num_feature, max_feature, n_classes",
     [
-        (DomainClassifier(num_features=20), BCELoss(), None, 4096, 2),
+        (DomainClassifier(num_features=20), BCEWithLogitsLoss(), None, 4096, 2),
         (DomainClassifier(num_features=20), None, None, 4096, 2),
         (None, None, 10, 4096, 2),
-        (None, BCELoss(), 10, 4096, 2),
-        (None, BCELoss(), 10, 10, 2),
+        (None, BCEWithLogitsLoss(), 10, 4096, 2),
+        (None, BCEWithLogitsLoss(), 10, 10, 2),
     ],
 )
 def test_cdan(domain_classifier, domain_criterion, num_feature, max_feature, n_classes):
@@ -121,7 +123,7 @@ def test_missing_num_features():
             reg=1,
             domain_classifier=None,
             num_features=None,
-            domain_criterion=BCELoss(),
+            domain_criterion=BCEWithLogitsLoss(),
             layer_name="dropout",
             batch_size=10,
             max_epochs=10,
@@ -134,7 +136,7 @@ def test_missing_num_features():
             reg=1,
             domain_classifier=None,
             num_features=None,
-            domain_criterion=BCELoss(),
+            domain_criterion=BCEWithLogitsLoss(),
             layer_name="dropout",
             batch_size=10,
             max_epochs=10,
@@ -150,7 +152,7 @@ def test_missing_n_classes():
             domain_classifier=None,
             num_features=10,
             n_classes=None,
-            domain_criterion=BCELoss(),
+            domain_criterion=BCEWithLogitsLoss(),
             layer_name="dropout",
             batch_size=10,
             max_epochs=10,
@@ -180,7 +182,7 @@ def test_return_features():
         domain_classifier=None,
         num_features=num_features,
         n_classes=n_classes,
-        domain_criterion=BCELoss(),
+        domain_criterion=BCEWithLogitsLoss(),
         layer_name="dropout",
         batch_size=10,
         max_epochs=10,
@@ -195,3 +197,65 @@ def test_return_features():
     features = method.predict_features(torch.tensor(X_test))
     assert features.shape[1] == num_features
     assert features.shape[0] == X_test.shape[0]
+
+
+@pytest.mark.parametrize("loss_class", [DANNLoss, CDANLoss])
+@pytest.mark.parametrize(
+    "domain_criterion",
+    [None, BCEWithLogitsLoss(pos_weight=torch.tensor([2.0]))],
+)
+def test_domain_loss_matches_two_criterion_calls(loss_class, domain_criterion):
+    # unbalanced batch, the weighted single call must give the sum of the means
+    n_s, n_t = 7, 3
+    loss = loss_class(domain_criterion=domain_criterion)
+    criterion = BCEWithLogitsLoss() if domain_criterion is None else domain_criterion
+
+    torch.manual_seed(42)
+    cached = []
+    for _ in range(2):
+        domain_pred_s = torch.randn(n_s, 1, requires_grad=True)
+        domain_pred_t = torch.randn(n_t, 1, requires_grad=True)
+        value = loss(None, None, None, domain_pred_s, domain_pred_t, None, None)
+        grad_s, grad_t = torch.autograd.grad(value, (domain_pred_s, domain_pred_t))
+
+        expected = criterion(domain_pred_s, torch.zeros(n_s, 1)) + criterion(
+            domain_pred_t, torch.ones(n_t, 1)
+        )
+        expected_s, expected_t = torch.autograd.grad(
+            expected, (domain_pred_s, domain_pred_t)
+        )
+        torch.testing.assert_close(value, expected)
+        torch.testing.assert_close(grad_s, expected_s)
+        torch.testing.assert_close(grad_t, expected_t)
+        cached.append(loss._label_cache[n_s, (n_s + n_t, 1), value.device, value.dtype])
+
+    # the second call reuses the labels computed for the first one
+    assert len(loss._label_cache) == 1
+    assert cached[1] is cached[0]
+
+
+def test_dann_reg_zero_skips_adapt_criterion():
+    dataset = make_shifted_datasets(
+        n_samples_source=20,
+        n_samples_target=20,
+        shift="concept_drift",
+        noise=0.1,
+        random_state=42,
+        return_dataset=True,
+    )
+    method = DANN(
+        ToyModule2D(),
+        reg=0,
+        num_features=10,
+        layer_name="dropout",
+        batch_size=10,
+        max_epochs=2,
+        train_split=None,
+    )
+
+    X, y, sample_domain = dataset.pack_train(as_sources=["s"], as_targets=["t"])
+    with mock.patch.object(DANNLoss, "forward") as adapt_forward:
+        method.fit(X.astype(np.float32), y, sample_domain)
+
+    adapt_forward.assert_not_called()
+    assert np.isfinite(method.history_[-1]["train_loss"])
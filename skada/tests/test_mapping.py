@@ -33,6 +33,7 @@ from skada import (
     make_da_pipeline,
     source_target_split,
 )
+from skada._mapping import _kernel_smoother, _mmd_consistency
 from skada.datasets import DomainAwareDataset, make_shifted_datasets
 
 
@@ -283,3 +284,44 @@ def test_mapping_source_samples(estimator, da_blobs_dataset):
         X_train[idx], sample_domain=sample_domain[idx], allow_source=True
     )
     assert y_pred.shape[0] == len(idx)
+
+
+@pytest.mark.skipif(not torch, reason="PyTorch not installed")
+def test_mmdlscons_closed_forms():
+    rng = np.random.default_rng(42)
+    m, n, gamma, reg_k = 8, 6, 0.5, 1e-2
+    X_source = torch.tensor(rng.standard_normal((m, 3)))
+    X_target = torch.tensor(rng.standard_normal((n, 3)) + 1)
+
+    # smoothing matrix against the explicit inverse
+    L = torch.exp(-gamma * torch.cdist(X_source, X_source, p=2))
+    omega = _kernel_smoother(L, reg_k)
+    omega_inv = L @ torch.linalg.inv(L + reg_k * torch.eye(m, dtype=L.dtype))
+    np.testing.assert_allclose(omega.numpy(), omega_inv.numpy(), atol=1e-10)
+
+    # MMD term against the explicit sums
+    X_new = 2 * X_source + 0.5
+    K = torch.exp(-gamma * torch.cdist(X_new, X_new, p=2))
+    K_cross = torch.exp(-gamma * torch.cdist(X_target, X_new, p=2))
+    J_cons = _mmd_consistency(K, K_cross, omega.sum(dim=0))
+    J_explicit = (1 / (m**2)) * torch.sum(omega_inv @ K @ omega_inv.T)
+    J_explicit -= (2 / (m * n)) * torch.sum(K_cross @ omega_inv.T)
+    np.testing.assert_allclose(J_cons.item(), J_explicit.item(), rtol=1e-8)
+
+    # one-hot encoding of non-contiguous labels: W = R G selects rows of G
+    y_source = np.array([0, 3, 3, 7, 0, 7, 3, 0])
+    dataset = DomainAwareDataset(
+        [
+            (X_source.numpy(), y_source, "s"),
+            (X_target.numpy(), np.zeros(n, dtype=int), "t"),
+        ]
+    )
+    X_train, y_train, sample_domain = dataset.pack_train(
+        as_sources=["s"], as_targets=["t"]
+    )
+    adapter = MMDLSConSMappingAdapter(gamma=gamma, max_iter=5)
+    adapter.fit(X_train, y_train, sample_domain=sample_domain)
+    np.testing.assert_array_equal(adapter.classes_, [0, 3, 7])
+    y_idx = np.searchsorted(adapter.classes_, y_source)
+    np.testing.assert_allclose(adapter.W_, adapter.G_[y_idx])
+    np.testing.assert_allclose(adapter.B_, adapter.H_[y_idx])
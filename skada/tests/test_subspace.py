@@ -7,7 +7,9 @@
 
 import numpy as np
 import pytest
+import scipy.linalg
 from sklearn.linear_model import LogisticRegression
+from sklearn.metrics.pairwise import linear_kernel, rbf_kernel
 from sklearn.neighbors import KNeighborsClassifier
 
 try:
@@ -26,6 +28,7 @@ from skada import (
     TransferSubspaceLearningAdapter,
     make_da_pipeline,
 )
+from skada._subspace import _full_kernel
 from skada.datasets import DomainAwareDataset
 
 
@@ -166,3 +169,135 @@ def test_subspace_default_n_components(adapter, n_samples, n_features, n_compone
 def test_instantiation_wrong_params(adapter, param_name, param_value):
     with pytest.raises(ValueError):
         adapter(**{param_name: param_value})
+
+
+def test_tca_eigvects_are_the_leading_generalized_eigenvectors(da_dataset):
+    X_train, y_train, sample_domain = da_dataset.pack_train(
+        as_sources=["s"], as_targets=["t"]
+    )
+    n_components = 3
+    adapter = TransferComponentAnalysisAdapter(n_components=n_components, mu=0.1)
+    adapter.fit(X_train, y_train, sample_domain=sample_domain)
+
+    K = adapter.K_
+    n = K.shape[0]
+    ns = adapter.X_source_.shape[0]
+    e = np.concatenate((np.full(ns, 1 / ns), np.full(n - ns, -1 / (n - ns))))
+    H = np.eye(n) - np.ones((n, n)) / n
+    A = np.eye(n) + adapter.mu * K @ np.outer(e, e) @ K
+    B = K @ H @ K
+    eigvals = scipy.linalg.eigvalsh(B, A)[::-1][:n_components]
+
+    V = adapter.eigvects_
+    rayleigh = np.einsum("ij,ij->j", V, B @ V) / np.einsum("ij,ij->j", V, A @ V)
+    assert V.shape == (n, n_components)
+    np.testing.assert_allclose(rayleigh, eigvals, rtol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "adapter",
+    [
+        TransferComponentAnalysisAdapter(n_components=2),
+        TransferJointMatchingAdapter(n_components=2, max_iter=5),
+    ],
+)
+def test_kernel_adapter_reuses_fit_data(adapter, da_dataset):
+    X, y, sample_domain = da_dataset.pack_train(as_sources=["s"], as_targets=["t"])
+    adapter.fit(X, y, sample_domain=sample_domain)
+
+    # fast path on the fitted array, fallback on a copy
+    X_fast = adapter.transform(X, sample_domain=sample_domain, allow_source=True)
+    X_fallback = adapter.transform(
+        X.copy(), sample_domain=sample_domain, allow_source=True
+    )
+    np.testing.assert_allclose(X_fast, X_fallback, atol=1e-8)
+
+    # in-place modifications are only detected with deep_check
+    X[0, 0] += 100
+    X_expected = adapter.transform(
+        X.copy(), sample_domain=sample_domain, allow_source=True
+    )
+    X_stale = adapter.transform(X, sample_domain=sample_domain, allow_source=True)
+    np.testing.assert_allclose(X_stale, X_fast)
+
+    adapter.set_params(deep_check=True)
+    X_deep = adapter.transform(X, sample_domain=sample_domain, allow_source=True)
+    np.testing.assert_allclose(X_deep, X_expected)
+    assert not np.allclose(X_deep, X_fast)
+
+
+@pytest.mark.parametrize(
+    "kernel, kernel_func",
+    [("rbf", rbf_kernel), ("linear", linear_kernel)],
+)
+def test_full_kernel(kernel, kernel_func):
+    rng = np.random.default_rng(42)
+    X_source = rng.standard_normal((30, 4))
+    X_target = rng.standard_normal((20, 4)) + 1
+
+    K = _full_kernel(X_source, X_target, kernel)
+
+    X = np.concatenate((X_source, X_target), axis=0)
+    np.testing.assert_allclose(K, kernel_func(X))
+
+
+@pytest.mark.parametrize("kernel", ["rbf", "linear"])
+def test_tca_float32(kernel, da_dataset):
+    adapter = TransferComponentAnalysisAdapter(
+        n_components=2, kernel=kernel, dtype=np.float32
+    )
+    X, y, sample_domain = da_dataset.pack_train(as_sources=["s"], as_targets=["t"])
+    X_train = adapter.fit_transform(X, y, sample_domain=sample_domain)
+
+    assert adapter.K_.dtype == np.float32
+    assert X_train.dtype == np.float32
+    assert np.all(np.isfinite(X_train))
+
+    X_test, _, sample_domain = da_dataset.pack_test(as_targets=["t"])
+    X_test = adapter.transform(X_test, sample_domain=sample_domain)
+    assert X_test.shape[1] == 2
+    assert X_test.dtype == np.float32
+    assert np.all(np.isfinite(X_test))
+
+
+def test_tca_estimator_dtype(da_dataset):
+    pipe = TransferComponentAnalysis(n_components=2, dtype=np.float32)
+    assert pipe.get_params()["transfercomponentanalysisadapter__dtype"] == np.float32
+
+    X, y, sample_domain = da_dataset.pack_train(as_sources=["s"], as_targets=["t"])
+    pipe.fit(X, y, sample_domain=sample_domain)
+    X_test, y_test, sample_domain = da_dataset.pack_test(as_targets=["t"])
+    y_pred = pipe.predict(X_test, sample_domain=sample_domain)
+    assert y_pred.shape == y_test.shape
+
+
+@pytest.mark.parametrize("n_components", [1, 2])
+def test_subspace_alignment_n_jobs(n_components):
+    # large enough for PCA to pick the randomized solver, which depends on the
+    # seed drawn for each domain
+    rng = np.random.default_rng(42)
+    dataset = DomainAwareDataset(
+        [
+            (rng.standard_normal((600, 100)), rng.integers(2, size=600), "s"),
+            (rng.standard_normal((600, 100)) + 1, rng.integers(2, size=600), "t"),
+        ]
+    )
+    X, y, sample_domain = dataset.pack_train(as_sources=["s"], as_targets=["t"])
+    adapter_seq = SubspaceAlignmentAdapter(
+        n_components=n_components, random_state=0
+    ).fit(X, y, sample_domain=sample_domain)
+    adapter_par = SubspaceAlignmentAdapter(
+        n_components=n_components, random_state=0, n_jobs=2
+    ).fit(X, y, sample_domain=sample_domain)
+
+    assert adapter_seq.pca_source_._fit_svd_solver == "randomized"
+    np.testing.assert_allclose(
+        adapter_par.pca_source_.components_, adapter_seq.pca_source_.components_
+    )
+    np.testing.assert_allclose(
+        adapter_par.pca_target_.components_, adapter_seq.pca_target_.components_
+    )
+    np.testing.assert_allclose(adapter_par.M_, adapter_seq.M_)
+
+    pipe = SubspaceAlignment(n_components=n_components, n_jobs=2)
+    assert pipe.get_params()["subspacealignmentadapter__n_jobs"] == 2